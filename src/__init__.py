@@ -15,17 +15,28 @@ bl_info = {
 if 'bpy' in locals():
     import importlib
     if 'mdl'        in locals(): importlib.reload(mdl)
+    if 'animation'  in locals(): importlib.reload(animation)
+    if 'sampler'    in locals(): importlib.reload(sampler)
+    if 'bake'       in locals(): importlib.reload(bake)
     if 'reader'     in locals(): importlib.reload(reader)
+    if 'writer'     in locals(): importlib.reload(writer)
     if 'importer'   in locals(): importlib.reload(importer)
 
 import os
-import bpy
+try:
+    import bpy
+except ImportError:
+    bpy = None  # Imported outside of Blender, e.g. to bake models headlessly.
 from . import reader
-from . import importer
+from . import writer
+from . import bake
 
-classes = (
-    importer.MDL_OT_ImportOperator,
-)
+if bpy is not None:
+    from . import importer
+
+    classes = (
+        importer.MDL_OT_ImportOperator,
+    )
 
 
 def menu_func_import(self, context):
@@ -0,0 +1,291 @@
+from .mdl import *
+import numpy
+
+# Keys that differ from a straight line by less than this are considered redundant, even with no tolerance set.
+KEYFRAME_EPSILON = 1e-5
+
+
+def decode_animation_channel(frame_count: int, values):
+    """
+    Expands a run-length encoded animation channel into one raw value per frame.
+
+    Each run is a header followed by `valid` explicit values, and spans `total` frames, with the last explicit value
+    held for the remainder of the run. Alongside the values, a mask of the frames that need a key to reproduce the
+    channel exactly is returned: every explicit value, plus the last frame of each held run.
+    """
+    raw_values = numpy.zeros(frame_count, dtype=numpy.float64)
+    key_mask = numpy.zeros(frame_count, dtype=bool)
+    frame_index = 0
+    value_index = 0
+    while frame_index < frame_count:
+        if value_index >= len(values) or values[value_index].header.total == 0:
+            raise RuntimeError('animation values ended before the last frame')
+        valid = values[value_index].header.valid
+        total = min(values[value_index].header.total, frame_count - frame_index)
+        for k in range(total):
+            raw_values[frame_index + k] = values[value_index + min(k + 1, valid)].data.value
+        key_mask[frame_index:frame_index + min(valid, total)] = True
+        key_mask[frame_index + total - 1] = True
+        frame_index += total
+        value_index += valid + 1
+    return raw_values, key_mask
+
+
+def encode_animation_channel(raw_values):
+    """
+    Run-length encodes raw per-frame values into animation values, the inverse of `decode_animation_channel`.
+
+    Each run takes explicit values for as long as they keep changing, then holds the last one for as long as it
+    repeats. Runs are capped at 255 frames, since both counts are stored in a byte.
+    """
+    raw_values = [int(value) for value in raw_values]
+    values = []
+    k = 0
+    while k < len(raw_values):
+        run = [raw_values[k]]
+        k += 1
+        while k < len(raw_values) and len(run) < 255 and raw_values[k] != run[-1]:
+            run.append(raw_values[k])
+            k += 1
+        total = len(run)
+        while k < len(raw_values) and total < 255 and raw_values[k] == run[-1]:
+            total += 1
+            k += 1
+        header = AnimationValue()
+        header.header.valid = len(run)
+        header.header.total = total
+        values.append(header)
+        for value in run:
+            data = AnimationValue()
+            data.data.value = value
+            values.append(data)
+    return values
+
+
+def decode_animation_eulers(mdl: Mdl, sequence, blend_index: int):
+    """
+    Decodes one blend of a sequence into per-frame bone locations and euler rotations, each of shape
+    (frame_count, bone_count, 3).
+
+    Also returns a (frame_count, bone_count) mask of the frames each bone needs keyed, and a (bone_count,) mask of
+    the bones that have any animated channel at all. Between two keyed frames of a bone, all of its channels are held.
+    """
+    frame_count = sequence.frame_count
+    bone_count = len(mdl.bones)
+    locations = numpy.empty((frame_count, bone_count, 3), dtype=numpy.float64)
+    rotations = numpy.empty((frame_count, bone_count, 3), dtype=numpy.float64)
+    key_mask = numpy.zeros((frame_count, bone_count), dtype=bool)
+    animated = numpy.zeros(bone_count, dtype=bool)
+    for bone_index, bone in enumerate(mdl.bones):
+        animation = sequence.animations[blend_index * bone_count + bone_index]
+        locations[:, bone_index] = bone.location
+        rotations[:, bone_index] = bone.rotation
+        # There are 6 channels, px, py, pz, rx, ry, rz (r values are euler angles)
+        for channel_index in range(6):
+            if animation.value_offsets[channel_index] <= 0:
+                continue
+            raw_values, channel_key_mask = decode_animation_channel(frame_count, animation.values[channel_index])
+            if channel_index < 3:
+                locations[:, bone_index, channel_index] += raw_values * bone.location_scale[channel_index]
+            else:
+                rotations[:, bone_index, channel_index - 3] += raw_values * bone.rotation_scale[channel_index - 3]
+            key_mask[:, bone_index] |= channel_key_mask
+            animated[bone_index] = True
+    if frame_count > 0:
+        key_mask[0, animated] = True
+        key_mask[-1, animated] = True
+    return locations, rotations, key_mask, animated
+
+
+def decode_animation(mdl: Mdl, sequence, blend_index: int):
+    """
+    Same as `decode_animation_eulers`, but with rotations as quaternions of shape (frame_count, bone_count, 4).
+    """
+    locations, rotations, key_mask, animated = decode_animation_eulers(mdl, sequence, blend_index)
+    return locations, euler_to_quaternion(rotations), key_mask, animated
+
+
+def calc_blend_weight(sequence, blender_index: int, blend_value: float) -> float:
+    """
+    Maps a blend parameter, in the units of the sequence's blend type, onto a [0, 1] weight between its blends.
+    Rotation blends are normalised the way the engine does it: the value is negated when the end angle is below the
+    start angle, and wrapped by 360 degrees to the side of the range it lies closest to.
+    """
+    blend_start = sequence.blend_start[blender_index]
+    blend_end = sequence.blend_end[blender_index]
+    if sequence.blend_type[blender_index] & (BoneControllerType.XR | BoneControllerType.YR | BoneControllerType.ZR):
+        if blend_end < blend_start:
+            blend_value = -blend_value
+        # Only ranges that don't already cover a full turn wrap.
+        if blend_start + 359.0 >= blend_end:
+            blend_middle = (blend_start + blend_end) / 2.0
+            if blend_value > blend_middle + 180.0:
+                blend_value -= 360.0
+            if blend_value < blend_middle - 180.0:
+                blend_value += 360.0
+    if blend_end == blend_start:
+        return 0.0
+    return min(max((blend_value - blend_start) / (blend_end - blend_start), 0.0), 1.0)
+
+
+def mix_animations(animation, other_animation, weight: float):
+    """
+    Mixes two decoded animations, as returned by `decode_animation`, by `weight`. Locations are lerped and rotations
+    slerped across all frames and bones at once.
+    """
+    if weight == 0.0:
+        return animation
+    if weight == 1.0:
+        return other_animation
+    locations, quaternions, key_mask, animated = animation
+    other_locations, other_quaternions, other_key_mask, other_animated = other_animation
+    return locations + (other_locations - locations) * weight, \
+        quaternion_slerp(quaternions, other_quaternions, weight), \
+        key_mask | other_key_mask, \
+        animated | other_animated
+
+
+def blend_animation(mdl: Mdl, sequence, blend_values):
+    """
+    Decodes a sequence mixed across its blends at a pair of blend parameters, with the same outputs as
+    `decode_animation`.
+
+    As in the engine, blends 0 and 1 are mixed by the first parameter. Sequences with 4 blends form a 2D grid: blends
+    2 and 3 are mixed by the first parameter as well, and the two results are then mixed by the second parameter.
+    """
+    if sequence.blend_count <= 1:
+        return decode_animation(mdl, sequence, 0)
+    weight = calc_blend_weight(sequence, 0, blend_values[0])
+    animation = mix_animations(decode_animation(mdl, sequence, 0), decode_animation(mdl, sequence, 1), weight)
+    if sequence.blend_count == 4:
+        other_animation = mix_animations(decode_animation(mdl, sequence, 2), decode_animation(mdl, sequence, 3), weight)
+        animation = mix_animations(animation, other_animation, calc_blend_weight(sequence, 1, blend_values[1]))
+    return animation
+
+
+def euler_to_quaternion(rotations):
+    """Converts XYZ euler angles of shape (..., 3) to (w, x, y, z) quaternions of shape (..., 4)."""
+    half = numpy.asarray(rotations, dtype=numpy.float64) * 0.5
+    sx, sy, sz = numpy.moveaxis(numpy.sin(half), -1, 0)
+    cx, cy, cz = numpy.moveaxis(numpy.cos(half), -1, 0)
+    return numpy.stack((
+        cx * cy * cz + sx * sy * sz,
+        sx * cy * cz - cx * sy * sz,
+        cx * sy * cz + sx * cy * sz,
+        cx * cy * sz - sx * sy * cz
+    ), axis=-1)
+
+
+def quaternion_multiply(a, b):
+    aw, ax, ay, az = numpy.moveaxis(a, -1, 0)
+    bw, bx, by, bz = numpy.moveaxis(b, -1, 0)
+    return numpy.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw
+    ), axis=-1)
+
+
+def quaternion_conjugate(q):
+    return q * numpy.array((1.0, -1.0, -1.0, -1.0))
+
+
+def quaternion_rotate(q, v):
+    """Rotates vectors of shape (..., 3) by quaternions of shape (..., 4)."""
+    w = q[..., :1]
+    u = q[..., 1:]
+    t = 2.0 * numpy.cross(u, v)
+    return v + w * t + numpy.cross(u, t)
+
+
+def quaternion_to_matrix(q):
+    """Converts (w, x, y, z) quaternions of shape (..., 4) to rotation matrices of shape (..., 3, 3)."""
+    w, x, y, z = numpy.moveaxis(q, -1, 0)
+    return numpy.stack((
+        numpy.stack((1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - w * z), 2.0 * (x * z + w * y)), axis=-1),
+        numpy.stack((2.0 * (x * y + w * z), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - w * x)), axis=-1),
+        numpy.stack((2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)), axis=-1)
+    ), axis=-2)
+
+
+def quaternion_slerp(a, b, t):
+    """Spherically interpolates quaternions of shape (..., 4); `t` must broadcast against (..., 1)."""
+    t = numpy.asarray(t, dtype=numpy.float64)
+    dot = numpy.sum(a * b, axis=-1, keepdims=True)
+    b = numpy.where(dot < 0.0, -b, b)
+    dot = numpy.minimum(numpy.abs(dot), 1.0)
+    theta = numpy.arccos(dot)
+    sin_theta = numpy.sin(theta)
+    # Fall back to a normalized lerp where the quaternions are nearly parallel.
+    is_parallel = sin_theta < 1e-6
+    safe_sin_theta = numpy.where(is_parallel, 1.0, sin_theta)
+    wa = numpy.where(is_parallel, 1.0 - t, numpy.sin((1.0 - t) * theta) / safe_sin_theta)
+    wb = numpy.where(is_parallel, t, numpy.sin(t * theta) / safe_sin_theta)
+    q = wa * a + wb * b
+    return q / numpy.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def make_quaternions_continuous(quaternions, axis: int = 0):
+    """Flips the sign of quaternions along `axis` so that neighbours never lie in opposite hemispheres."""
+    quaternions = numpy.moveaxis(numpy.array(quaternions, dtype=numpy.float64), axis, 0)
+    for i in range(1, len(quaternions)):
+        flip = numpy.sum(quaternions[i] * quaternions[i - 1], axis=-1) < 0.0
+        quaternions[i][flip] *= -1.0
+    return numpy.moveaxis(quaternions, 0, axis)
+
+
+def calc_pose_basis(mdl: Mdl, locations, quaternions):
+    """
+    Converts bone-local locations of shape (..., bone_count, 3) and quaternions of shape (..., bone_count, 4) into
+    pose-bone basis locations and quaternions, i.e. relative to each bone's rest transform.
+    """
+    rest_locations = numpy.array([bone.location for bone in mdl.bones], dtype=numpy.float64)
+    rest_quaternions = euler_to_quaternion([bone.rotation for bone in mdl.bones])
+    inverse_rest_quaternions = quaternion_conjugate(rest_quaternions)
+    basis_locations = quaternion_rotate(inverse_rest_quaternions, locations - rest_locations)
+    basis_quaternions = quaternion_multiply(inverse_rest_quaternions, quaternions)
+    return basis_locations, basis_quaternions
+
+
+def calc_world_matrices(mdl: Mdl, locations, quaternions):
+    """
+    Builds world matrices of shape (..., bone_count, 4, 4) from bone-local locations of shape (..., bone_count, 3)
+    and quaternions of shape (..., bone_count, 4). Leading dimensions, such as frames, are processed in one pass.
+    """
+    local_matrices = numpy.zeros(locations.shape[:-1] + (4, 4), dtype=numpy.float64)
+    local_matrices[..., :3, :3] = quaternion_to_matrix(quaternions)
+    local_matrices[..., :3, 3] = locations
+    local_matrices[..., 3, 3] = 1.0
+    # Parents always precede their children, so a single pass resolves the hierarchy.
+    world_matrices = numpy.empty_like(local_matrices)
+    for bone_index, bone in enumerate(mdl.bones):
+        if bone.parent_index >= 0:
+            world_matrices[..., bone_index, :, :] = \
+                world_matrices[..., bone.parent_index, :, :] @ local_matrices[..., bone_index, :, :]
+        else:
+            world_matrices[..., bone_index, :, :] = local_matrices[..., bone_index, :, :]
+    return world_matrices
+
+
+def reduce_keyframes(frames, values, tolerance: float = 0.0):
+    """
+    Returns the indices of the keys that must be kept so that linear interpolation between them reproduces `values`
+    at every one of `frames` to within `tolerance`. The first and last keys are always kept.
+    """
+    frames = numpy.asarray(frames, dtype=numpy.float64)
+    values = numpy.asarray(values, dtype=numpy.float64)
+    tolerance = max(tolerance, 0.0) + KEYFRAME_EPSILON
+    if len(frames) <= 2:
+        return numpy.arange(len(frames))
+    kept = [0]
+    anchor = 0
+    for end in range(2, len(frames)):
+        # Check whether the segment from the anchor to `end` reproduces every key in between.
+        t = (frames[anchor + 1:end] - frames[anchor]) / (frames[end] - frames[anchor])
+        interpolated = values[anchor] + (values[end] - values[anchor]) * t
+        if numpy.any(numpy.abs(interpolated - values[anchor + 1:end]) > tolerance):
+            anchor = end - 1
+            kept.append(anchor)
+    kept.append(len(frames) - 1)
+    return numpy.array(kept)
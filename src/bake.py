@@ -0,0 +1,62 @@
+from .sampler import PoseSampler
+from .mdl import *
+import numpy
+
+
+def bake_hitboxes_and_attachments(mdl: Mdl, blend_index: int = 0, controllers=()):
+    """
+    Computes, for every frame of every sequence, the oriented box and world-space AABB of each hitbox and the world
+    position of each attachment, without creating any Blender objects.
+
+    Frames of all sequences are concatenated; frames `sequence_frame_offsets[i]` up to `sequence_frame_offsets[i + 1]`
+    belong to sequence `i`. Sequences whose animations are not loaded contribute no frames.
+
+    `blend_index` is clamped to the blends each sequence has, so sequences without that many blends are baked with
+    their last blend; `sequence_blend_indices` records the blend used for each sequence.
+    """
+    sampler = PoseSampler(mdl)
+    bone_matrices = []
+    sequence_frame_offsets = [0]
+    sequence_blend_indices = []
+    for sequence_index, sequence in enumerate(mdl.sequences):
+        frame_count = 0
+        sequence_blend_index = min(max(blend_index, 0), sequence.blend_count - 1)
+        sequence_blend_indices.append(sequence_blend_index)
+        if hasattr(sequence, 'animations'):
+            bone_matrices.append(sampler.calc_sequence_bone_matrices(sequence_index, sequence_blend_index,
+                                                                     controllers))
+            frame_count = len(bone_matrices[-1])
+        sequence_frame_offsets.append(sequence_frame_offsets[-1] + frame_count)
+    if bone_matrices:
+        bone_matrices = numpy.concatenate(bone_matrices)
+    else:
+        bone_matrices = numpy.zeros((0, len(mdl.bones), 4, 4))
+
+    hitbox_matrices = sampler.calc_hitbox_matrices(bone_matrices)
+    hitbox_extents = numpy.array([bounding_box_extents(hitbox.bounding_box) for hitbox in mdl.hitboxes],
+                                 dtype=numpy.float64).reshape(-1, 3)
+    # The hitbox matrices scale the unit cube by the extents, so divide them back out of the axes.
+    hitbox_rotations = hitbox_matrices[..., :3, :3] / numpy.where(hitbox_extents == 0.0, 1.0, hitbox_extents)[:, None]
+    hitbox_centers = hitbox_matrices[..., :3, 3]
+    hitbox_half_sizes = numpy.abs(hitbox_matrices[..., :3, :3]).sum(axis=-1)
+    attachment_positions = sampler.calc_attachment_matrices(bone_matrices)[..., :3, 3]
+
+    return {
+        'sequence_names': numpy.array([sequence.name.decode() for sequence in mdl.sequences], dtype=str),
+        'sequence_frame_offsets': numpy.array(sequence_frame_offsets, dtype=numpy.int32),
+        'sequence_blend_indices': numpy.array(sequence_blend_indices, dtype=numpy.int32),
+        'hitbox_bone_indices': numpy.array([hitbox.bone_index for hitbox in mdl.hitboxes], dtype=numpy.int32),
+        'hitbox_group_indices': numpy.array([hitbox.group_index for hitbox in mdl.hitboxes], dtype=numpy.int32),
+        'hitbox_extents': hitbox_extents.astype(numpy.float32),
+        'hitbox_centers': hitbox_centers.astype(numpy.float32),
+        'hitbox_rotations': hitbox_rotations.astype(numpy.float32),
+        'hitbox_mins': (hitbox_centers - hitbox_half_sizes).astype(numpy.float32),
+        'hitbox_maxs': (hitbox_centers + hitbox_half_sizes).astype(numpy.float32),
+        'attachment_names': numpy.array([attachment.name.decode() for attachment in mdl.attachments], dtype=str),
+        'attachment_positions': attachment_positions.astype(numpy.float32),
+    }
+
+
+def bake_to_file(mdl: Mdl, path: str, blend_index: int = 0, controllers=()):
+    """Bakes hitboxes and attachments (see `bake_hitboxes_and_attachments`) to a compressed .npz file."""
+    numpy.savez_compressed(path, **bake_hitboxes_and_attachments(mdl, blend_index, controllers))
@@ -4,9 +4,11 @@ import bmesh
 import os
 import math
 from mathutils import Vector, Matrix, Quaternion
-from bpy.props import StringProperty, BoolProperty, IntProperty, FloatProperty, CollectionProperty
+from bpy.props import StringProperty, BoolProperty, IntProperty, FloatProperty, FloatVectorProperty, EnumProperty, CollectionProperty
 from .reader import MdlReader
 from .mdl import *
+from .animation import *
+import numpy
 
 
 class MDL_OT_ImportOperator(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
@@ -30,6 +32,29 @@ class MDL_OT_ImportOperator(bpy.types.Operator, bpy_extras.io_utils.ImportHelper
     should_import_attachments: BoolProperty(default=True)
     should_import_materials: BoolProperty(default=True)
     should_import_animations: BoolProperty(default=False)
+    animation_tolerance: FloatProperty(
+        name='Animation Tolerance',
+        description='Drop animation keys that linear interpolation reproduces to within this error',
+        default=0.0,
+        min=0.0
+    )
+    blend_import_mode: EnumProperty(
+        name='Blends',
+        description='How to import sequences that blend between several poses',
+        items=(
+            ('FIRST', 'First Blend', 'Import only the first blend of each sequence'),
+            ('SEPARATE', 'Separate Actions', 'Import each blend of a sequence as its own action'),
+            ('MIX', 'Mix', 'Import each sequence mixed across its blends at the blend values'),
+        ),
+        default='FIRST'
+    )
+    blend_values: FloatVectorProperty(
+        name='Blend Values',
+        description='Blend parameters used when mixing blends, between the blend start and end of each sequence. '
+                    'The second value is only used by sequences with 4 blends',
+        size=2,
+        default=(0.0, 0.0)
+    )
 
     def import_mdl(self, mdl):
         model_name = os.path.splitext(os.path.basename(mdl.file_path))[0]
@@ -219,22 +244,56 @@ class MDL_OT_ImportOperator(bpy.types.Operator, bpy_extras.io_utils.ImportHelper
         if self.should_import_animations:
             armature_object.animation_data_create()
             actions = []
-            for sequence_index, sequence in enumerate(mdl.sequences):
-                action = bpy.data.actions.new(name=sequence.name.decode())
-                armature_object.animation_data.action = action
-                blend_index = 0
-                for frame_index in range(sequence.frame_count):
-                    bpy.context.scene.frame_set(frame_index)
-                    bone_matrices = mdl.calc_bone_matrices(sequence_index, blend_index, frame_index)
-                    for bone_index, (bone, bone_matrix) in enumerate(zip(mdl.bones, bone_matrices)):
-                        pose_bone = armature_object.pose.bones[bone_index]
-                        pose_bone.matrix = Matrix(bone_matrix)
-                        pose_bone.keyframe_insert('location')
-                        pose_bone.keyframe_insert('rotation_quaternion')
-                actions.append(action)
-            armature_object.animation_data.action = actions[0]
+            skipped_sequence_names = []
+            for sequence in mdl.sequences:
+                sequence_name = sequence.name.decode()
+                # Only animations in the model itself are read; those in external sequence group files are not.
+                if not hasattr(sequence, 'animations'):
+                    skipped_sequence_names.append(sequence_name)
+                    continue
+                if self.blend_import_mode == 'SEPARATE' and sequence.blend_count > 1:
+                    for blend_index in range(sequence.blend_count):
+                        action = bpy.data.actions.new(name=f'{sequence_name}_blend{blend_index}')
+                        self.import_action(mdl, action, *decode_animation(mdl, sequence, blend_index))
+                        actions.append(action)
+                else:
+                    action = bpy.data.actions.new(name=sequence_name)
+                    if self.blend_import_mode == 'MIX':
+                        self.import_action(mdl, action, *blend_animation(mdl, sequence, self.blend_values))
+                    else:
+                        self.import_action(mdl, action, *decode_animation(mdl, sequence, 0))
+                    actions.append(action)
+            if skipped_sequence_names:
+                self.report({'WARNING'}, f'Skipped {len(skipped_sequence_names)} sequence(s) stored in external '
+                                         f'sequence group files: {", ".join(skipped_sequence_names)}')
+            if actions:
+                armature_object.animation_data.action = actions[0]
             bpy.context.scene.frame_set(0)
 
+    def import_action(self, mdl, action, locations, quaternions, key_mask, animated):
+        basis_locations, basis_quaternions = calc_pose_basis(mdl, locations, quaternions)
+        basis_quaternions = make_quaternions_continuous(basis_quaternions)
+        # foreach_set takes enum properties by their integer value rather than their identifier.
+        linear_interpolation = bpy.types.Keyframe.bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+        for bone_index, bone in enumerate(mdl.bones):
+            # Bones with no animated channels stay in their rest pose and get no F-Curves at all.
+            if not animated[bone_index]:
+                continue
+            bone_name = bone.name.decode()
+            frames = numpy.flatnonzero(key_mask[:, bone_index])
+            channels = [('location', i, basis_locations[frames, bone_index, i], 0.0) for i in range(3)] + \
+                       [('rotation_quaternion', i, basis_quaternions[frames, bone_index, i], 1.0 if i == 0 else 0.0)
+                        for i in range(4)]
+            for data_path, index, values, default_value in channels:
+                if numpy.all(numpy.abs(values - default_value) <= self.animation_tolerance + KEYFRAME_EPSILON):
+                    continue
+                keys = reduce_keyframes(frames, values, self.animation_tolerance)
+                fcurve = action.fcurves.new(f'pose.bones["{bone_name}"].{data_path}', index=index, action_group=bone_name)
+                fcurve.keyframe_points.add(len(keys))
+                fcurve.keyframe_points.foreach_set('co', numpy.column_stack((frames[keys], values[keys])).astype(numpy.float32).ravel())
+                fcurve.keyframe_points.foreach_set('interpolation', [linear_interpolation] * len(keys))
+                fcurve.update()
+
     def execute(self, context):
         mdl = MdlReader.from_file(self.filepath)
         self.import_mdl(mdl)
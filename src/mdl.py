@@ -1,7 +1,7 @@
 # https://github.com/ZeqMacaw/Crowbar/blob/master/Crowbar/Core/GameModel/SourceModel10/SourceMdlFile10.vb
 
 from ctypes import *
-from enum import Enum
+from enum import Enum, IntFlag
 from mathutils import Euler, Quaternion, Matrix
 import math
 
@@ -106,6 +106,16 @@ class BoneController(Structure):
     ]
 
 
+class BoneControllerType(IntFlag):
+    X = 0x0001
+    Y = 0x0002
+    Z = 0x0004
+    XR = 0x0008
+    YR = 0x0010
+    ZR = 0x0020
+    RLOOP = 0x8000
+
+
 class Sequence(Structure):
     _fields_ = [
         ('name', c_char * 32),
@@ -138,6 +148,15 @@ class Sequence(Structure):
     ]
 
 
+class SequenceGroup(Structure):
+    _fields_ = [
+        ('label', c_char * 32),
+        ('name', c_char * 64),
+        ('unused1', c_int32),
+        ('unused2', c_int32)
+    ]
+
+
 class SequenceEvent(Structure):
     _fields_ = [
         ('frame_index', c_int32),
@@ -251,13 +270,17 @@ class AnimationValue(Union):
 class Mdl(object):
     def __init__(self):
         self.file_path = ''
+        self.header = None
         self.bones = []
         self.bone_controllers = []
         self.hitboxes = []
         self.sequences = []
+        self.sequence_groups = []
+        self.transitions = b''
         self.textures = []
         self.skin_families = []
         self.body_parts = []
+        self.attachments = []
 
     # TODO: we need the damned bind pose
 
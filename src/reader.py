@@ -21,7 +21,7 @@ def get_bone_transform(bone):
     px, py, pz = bone.location
     rotation_matrix = Euler((r, p, y), 'XYZ').to_matrix().to_4x4()
     translation_matrix = Matrix.Translation((px, py, pz))
-    return rotation_matrix @ translation_matrix
+    return translation_matrix @ rotation_matrix
 
 
 class MdlReader(object):
@@ -35,6 +35,7 @@ class MdlReader(object):
             header = Header.from_buffer_copy(f.read(sizeof(Header)))
             if header.version != expected_version:
                 raise RuntimeError(f'MDL version not supported (found: {header.version}, expected {expected_version})')
+            mdl.header = header
             mdl.bones = read_chunk(f, header.bone_offset, Bone, header.bone_count)
             mdl.bone_controllers = read_chunk(f, header.bone_controller_offset, BoneController, header.bone_controller_count)
             mdl.hitboxes = read_chunk(f, header.hitbox_offset, Hitbox, header.hitbox_count)
@@ -44,6 +45,9 @@ class MdlReader(object):
                 sequence.events = read_chunk(f, sequence.event_offset, SequenceEvent, sequence.event_count)
                 sequence.pivots = read_chunk(f, sequence.pivot_offset, SequencePivot, sequence.pivot_count)
 
+            mdl.sequence_groups = read_chunk(f, header.sequence_group_offset, SequenceGroup, header.sequence_group_count)
+            f.seek(header.transition_offset)
+            mdl.transitions = f.read(header.transition_count * header.transition_count)
             mdl.textures = read_chunk(f, header.texture_offset, Texture, header.texture_count)
             mdl.skin_families = [unpack(f'{header.skin_reference_count}H', f) for _ in range(header.skin_family_count)]
             mdl.body_parts = read_chunk(f, header.body_part_offset, BodyPart, header.body_part_count)
@@ -51,8 +55,10 @@ class MdlReader(object):
 
             for texture in mdl.textures:
                 f.seek(texture.data_offset)
-                pixels = list(f.read(texture.width * texture.height))
-                palette = numpy.ndarray((256, 3), dtype=numpy.uint8, buffer=f.read(256 * 3))
+                texture.indices = f.read(texture.width * texture.height)
+                texture.palette = f.read(256 * 3)
+                pixels = list(texture.indices)
+                palette = numpy.ndarray((256, 3), dtype=numpy.uint8, buffer=texture.palette)
                 data = numpy.ones((texture.height, texture.width, 4))
                 j = 0
                 for y in range(texture.height):
@@ -74,6 +80,9 @@ class MdlReader(object):
                     # normals
                     f.seek(model.normal_offset)
                     model.normals = list(struct.iter_unpack('3f', f.read(struct.calcsize('3f') * model.normal_count)))
+                    # normal bone indices
+                    f.seek(model.normal_bone_info_offset)
+                    model.normal_bone_indices = list(f.read(model.normal_count))
                     for mesh in model.meshes:
                         # faces
                         f.seek(mesh.face_offset)
@@ -104,7 +113,7 @@ class MdlReader(object):
                         animation = Animation()
                         # There are 6 channels, px, py, pz, rx, ry, rz (r values are euler angles)
                         for offset_index in range(len(animation.value_offsets)):
-                            animation.value_offsets[offset_index] = unpack('h', f)[0]
+                            animation.value_offsets[offset_index] = unpack('H', f)[0]
                             if animation.value_offsets[offset_index] > 0:
                                 pos = f.tell()
                                 f.seek(animation_file_offset + animation.value_offsets[offset_index])
@@ -0,0 +1,129 @@
+from .animation import *
+from collections import OrderedDict
+import math
+import numpy
+
+
+class PoseSampler(object):
+    """
+    Samples world-space bone, attachment and hitbox matrices of a model at fractional frames and arbitrary bone
+    controller values, without Blender.
+
+    Frames are interpolated the way the engine does it: locations are lerped and rotations slerped between the two
+    nearest frames. Bone matrices are memoized in a bounded LRU cache, so repeated queries are near-free.
+    """
+
+    def __init__(self, mdl: Mdl, cache_size: int = 256):
+        self.mdl = mdl
+        self.cache_size = cache_size
+        self._animations = {}
+        self._bone_matrices = OrderedDict()
+        self._attachment_bone_indices = numpy.array([attachment.bone_index for attachment in mdl.attachments],
+                                                    dtype=int)
+        self._attachment_matrices = numpy.tile(numpy.identity(4), (len(mdl.attachments), 1, 1))
+        for attachment_index, attachment in enumerate(mdl.attachments):
+            self._attachment_matrices[attachment_index, :3, 3] = attachment.location
+        # Hitbox matrices map the unit cube onto the box, matching the empties created on import.
+        self._hitbox_bone_indices = numpy.array([hitbox.bone_index for hitbox in mdl.hitboxes], dtype=int)
+        self._hitbox_matrices = numpy.tile(numpy.identity(4), (len(mdl.hitboxes), 1, 1))
+        for hitbox_index, hitbox in enumerate(mdl.hitboxes):
+            self._hitbox_matrices[hitbox_index, :3, :3] = numpy.diag(bounding_box_extents(hitbox.bounding_box))
+            self._hitbox_matrices[hitbox_index, :3, 3] = bounding_box_center(hitbox.bounding_box)
+
+    def frame_at_time(self, sequence_index: int, time: float) -> float:
+        """Converts a time in seconds into a fractional frame of a sequence, for querying poses by time."""
+        return time * self.mdl.sequences[sequence_index].fps
+
+    def bone_matrices(self, sequence_index: int, blend_index: int, frame: float, controllers=()):
+        """
+        Returns the (bone_count, 4, 4) world matrices of the bones. `frame` may be fractional; to query by time, convert
+        it with `frame_at_time` first. `controllers` holds a value for each bone controller channel, in degrees for
+        rotation controllers; missing values are taken to be zero.
+        The returned array is shared with the cache and is read-only.
+        """
+        key = (sequence_index, blend_index, float(frame), tuple(controllers))
+        matrices = self._bone_matrices.get(key)
+        if matrices is not None:
+            self._bone_matrices.move_to_end(key)
+            return matrices
+        matrices = self.calc_bone_matrices(sequence_index, blend_index, frame, controllers)
+        matrices.flags.writeable = False
+        self._bone_matrices[key] = matrices
+        if len(self._bone_matrices) > self.cache_size:
+            self._bone_matrices.popitem(last=False)
+        return matrices
+
+    def attachment_matrices(self, sequence_index: int, blend_index: int, frame: float, controllers=()):
+        return self.calc_attachment_matrices(self.bone_matrices(sequence_index, blend_index, frame, controllers))
+
+    def hitbox_matrices(self, sequence_index: int, blend_index: int, frame: float, controllers=()):
+        return self.calc_hitbox_matrices(self.bone_matrices(sequence_index, blend_index, frame, controllers))
+
+    def calc_attachment_matrices(self, bone_matrices):
+        """Maps bone matrices of shape (..., bone_count, 4, 4) to attachment matrices of shape (..., count, 4, 4)."""
+        return bone_matrices[..., self._attachment_bone_indices, :, :] @ self._attachment_matrices
+
+    def calc_hitbox_matrices(self, bone_matrices):
+        """Maps bone matrices of shape (..., bone_count, 4, 4) to hitbox matrices of shape (..., count, 4, 4)."""
+        return bone_matrices[..., self._hitbox_bone_indices, :, :] @ self._hitbox_matrices
+
+    def clear_cache(self):
+        self._bone_matrices.clear()
+
+    def get_animation(self, sequence_index: int, blend_index: int):
+        """Returns the decoded locations and euler rotations of a blend, decoding it on first use."""
+        key = (sequence_index, blend_index)
+        if key not in self._animations:
+            sequence = self.mdl.sequences[sequence_index]
+            if not hasattr(sequence, 'animations'):
+                raise RuntimeError(f'sequence {sequence.name.decode()} has no animations loaded')
+            if not 0 <= blend_index < sequence.blend_count:
+                raise RuntimeError(f'sequence {sequence.name.decode()} has no blend {blend_index} '
+                                   f'(blend count: {sequence.blend_count})')
+            locations, rotations, _, _ = decode_animation_eulers(self.mdl, sequence, blend_index)
+            self._animations[key] = locations, rotations
+        return self._animations[key]
+
+    def calc_bone_adjustments(self, controllers):
+        """Returns the (bone_count, 6) amounts that the bone controllers add to each bone channel."""
+        controller_adjustments = []
+        for bone_controller in self.mdl.bone_controllers:
+            value = controllers[bone_controller.index] if bone_controller.index < len(controllers) else 0.0
+            if bone_controller.type & BoneControllerType.RLOOP:
+                value = bone_controller.start_angle + (value - bone_controller.start_angle) % 360.0
+            else:
+                low = min(bone_controller.start_angle, bone_controller.end_angle)
+                high = max(bone_controller.start_angle, bone_controller.end_angle)
+                value = min(max(value, low), high)
+            if bone_controller.type & (BoneControllerType.XR | BoneControllerType.YR | BoneControllerType.ZR):
+                value = math.radians(value)
+            controller_adjustments.append(value)
+        adjustments = numpy.zeros((len(self.mdl.bones), 6), dtype=numpy.float64)
+        for bone_index, bone in enumerate(self.mdl.bones):
+            for channel_index, bone_controller_index in enumerate(bone.bone_controllers):
+                if bone_controller_index != -1:
+                    adjustments[bone_index, channel_index] = controller_adjustments[bone_controller_index]
+        return adjustments
+
+    def calc_bone_matrices(self, sequence_index: int, blend_index: int, frame: float, controllers=()):
+        """Same as `bone_matrices`, but always recomputed and never cached."""
+        locations, rotations = self.get_animation(sequence_index, blend_index)
+        if len(locations) == 0:
+            raise RuntimeError(f'sequence {self.mdl.sequences[sequence_index].name.decode()} has no frames')
+        frame = min(max(frame, 0.0), len(locations) - 1)
+        frame_index = min(int(frame), len(locations) - 1)
+        next_frame_index = min(frame_index + 1, len(locations) - 1)
+        t = frame - frame_index
+        adjustments = self.calc_bone_adjustments(controllers)
+        location = locations[frame_index] + (locations[next_frame_index] - locations[frame_index]) * t
+        location += adjustments[:, :3]
+        quaternion = quaternion_slerp(euler_to_quaternion(rotations[frame_index] + adjustments[:, 3:]),
+                                      euler_to_quaternion(rotations[next_frame_index] + adjustments[:, 3:]), t)
+        return calc_world_matrices(self.mdl, location, quaternion)
+
+    def calc_sequence_bone_matrices(self, sequence_index: int, blend_index: int = 0, controllers=()):
+        """Returns the (frame_count, bone_count, 4, 4) world matrices of the bones for every frame of a sequence."""
+        locations, rotations = self.get_animation(sequence_index, blend_index)
+        adjustments = self.calc_bone_adjustments(controllers)
+        return calc_world_matrices(self.mdl, locations + adjustments[:, :3],
+                                   euler_to_quaternion(rotations + adjustments[:, 3:]))
@@ -0,0 +1,266 @@
+from .animation import *
+from ctypes import sizeof
+from collections import defaultdict
+import struct
+import numpy
+
+
+def copy_chunk(item):
+    return type(item).from_buffer_copy(item)
+
+
+def pack_chunk(items):
+    """Packs a list of structures into bytes in one go, rather than one structure at a time."""
+    if len(items) == 0:
+        return b''
+    return bytes((type(items[0]) * len(items))(*items))
+
+
+class MdlBuffer(object):
+    """A growable byte buffer that hands out offsets, so sections can be reserved first and filled in later."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def align(self, alignment: int = 4):
+        self.data.extend(bytes(-len(self.data) % alignment))
+
+    def reserve(self, size: int) -> int:
+        self.align()
+        offset = len(self.data)
+        self.data.extend(bytes(size))
+        return offset
+
+    def append(self, data) -> int:
+        self.align()
+        offset = len(self.data)
+        self.data.extend(data)
+        return offset
+
+    def write_at(self, offset: int, data):
+        self.data[offset:offset + len(data)] = data
+
+
+def triangles_from_faces(faces):
+    """
+    Expands triangle strips and fans into triangles. Each face vertex is keyed by its (vertex_index, normal_index,
+    u, v) tuple, and triangles keep the winding the engine draws them with.
+    """
+    triangles = []
+    for face in faces:
+        keys = [(v.vertex_index, v.normal_index, v.u, v.v) for v in face.vertices]
+        if face.primitive_type == PrimitiveType.TRIANGLE_STRIP:
+            for i in range(len(keys) - 2):
+                if i % 2 == 0:
+                    triangles.append((keys[i], keys[i + 1], keys[i + 2]))
+                else:
+                    triangles.append((keys[i + 1], keys[i], keys[i + 2]))
+        else:
+            for i in range(1, len(keys) - 1):
+                triangles.append((keys[0], keys[i], keys[i + 1]))
+    return triangles
+
+
+def build_faces(triangles):
+    """
+    Greedily covers triangles with as few triangle strips and fans as possible.
+
+    Starting from the least connected unused triangle, both a strip and a fan are grown from each of its three
+    rotations and the longest is kept. Starting at the edges of the mesh leaves fewer isolated triangles behind.
+    """
+    # Maps each directed edge to the triangles that wind along it, along with their third vertex.
+    edges = defaultdict(list)
+    for triangle_index, (a, b, c) in enumerate(triangles):
+        edges[(a, b)].append((triangle_index, c))
+        edges[(b, c)].append((triangle_index, a))
+        edges[(c, a)].append((triangle_index, b))
+
+    is_used = [False] * len(triangles)
+
+    def find_next(p, q, grown):
+        for triangle_index, r in edges[(p, q)]:
+            if not is_used[triangle_index] and triangle_index not in grown:
+                return triangle_index, r
+        return None
+
+    def grow(triangle_index, keys, primitive_type):
+        grown = {triangle_index}
+        keys = list(keys)
+        while len(keys) < 32767:
+            i = len(keys) - 2
+            if primitive_type == PrimitiveType.TRIANGLE_FAN:
+                edge = (keys[0], keys[-1])
+            elif i % 2 == 0:
+                edge = (keys[i], keys[i + 1])
+            else:
+                edge = (keys[i + 1], keys[i])
+            next_triangle = find_next(*edge, grown)
+            if next_triangle is None:
+                break
+            grown.add(next_triangle[0])
+            keys.append(next_triangle[1])
+        return grown, keys
+
+    neighbour_counts = [sum(len(edges[(q, p)]) for p, q in ((a, b), (b, c), (c, a))) for a, b, c in triangles]
+    faces = []
+    for triangle_index in sorted(range(len(triangles)), key=lambda index: neighbour_counts[index]):
+        if is_used[triangle_index]:
+            continue
+        a, b, c = triangles[triangle_index]
+        best = None
+        for keys in ((a, b, c), (b, c, a), (c, a, b)):
+            for primitive_type in (PrimitiveType.TRIANGLE_STRIP, PrimitiveType.TRIANGLE_FAN):
+                grown, face_keys = grow(triangle_index, keys, primitive_type)
+                if best is None or len(grown) > len(best[0]):
+                    best = grown, face_keys, primitive_type
+        grown, face_keys, primitive_type = best
+        for index in grown:
+            is_used[index] = True
+        face = Face()
+        face.primitive_type = primitive_type
+        face.vertices = [FaceVertex(*key) for key in face_keys]
+        faces.append(face)
+    return faces
+
+
+def pack_faces(faces):
+    """Packs faces into the command list the engine draws from: a signed vertex count, negative for fans, followed by
+    the face vertices, with a zero count at the end."""
+    data = bytearray()
+    for face in faces:
+        count = len(face.vertices)
+        data.extend(struct.pack('h', -count if face.primitive_type == PrimitiveType.TRIANGLE_FAN else count))
+        data.extend(pack_chunk(face.vertices))
+    data.extend(struct.pack('h', 0))
+    return bytes(data)
+
+
+def pack_animations(mdl: Mdl, sequence):
+    """
+    Packs every blend of a sequence into its animation structs, which sit contiguously up front, followed by the
+    run-length encoded values of each channel. Channels that never leave the rest pose are left out entirely.
+    """
+    bone_count = len(mdl.bones)
+    header_size = sequence.blend_count * bone_count * 12
+    headers = bytearray(header_size)
+    data = bytearray()
+    for animation_index, animation in enumerate(sequence.animations):
+        value_offsets = [0] * 6
+        for channel_index in range(6):
+            if animation.value_offsets[channel_index] <= 0:
+                continue
+            raw_values, _ = decode_animation_channel(sequence.frame_count, animation.values[channel_index])
+            if not numpy.any(raw_values):
+                continue
+            value_offset = header_size + len(data) - animation_index * 12
+            if value_offset > 0xFFFF:
+                raise RuntimeError(f'animation data of sequence {sequence.name.decode()} is too large')
+            value_offsets[channel_index] = value_offset
+            data.extend(pack_chunk(encode_animation_channel(raw_values)))
+        headers[animation_index * 12:(animation_index + 1) * 12] = struct.pack('6H', *value_offsets)
+    return bytes(headers + data)
+
+
+class MdlWriter(object):
+
+    @staticmethod
+    def to_file(mdl: Mdl, path: str, optimize_faces: bool = False):
+        """
+        Writes a model in the MDL v10 format. Animations are always re-encoded; with `optimize_faces`, the triangle
+        strips and fans of every mesh are rebuilt as well.
+        """
+        with open(path, 'wb') as f:
+            f.write(MdlWriter.to_bytes(mdl, optimize_faces))
+
+    @staticmethod
+    def to_bytes(mdl: Mdl, optimize_faces: bool = False) -> bytes:
+        """
+        Same as `to_file`, but returns the bytes instead of writing them.
+
+        The reader does not load model deformation groups or per-mesh normal data, and the engine uses neither, so
+        `Model.group_count`, `Model.group_offset` and `Mesh.normal_offset` are written as zero rather than left
+        pointing into the source file. `Mesh.normal_count` is kept, since it is only a count.
+        """
+        buffer = MdlBuffer()
+        header = copy_chunk(mdl.header) if mdl.header is not None else Header()
+        header.magic = b'IDST'
+        header.version = 10
+        header_offset = buffer.reserve(sizeof(Header))
+
+        header.bone_count = len(mdl.bones)
+        header.bone_offset = buffer.append(pack_chunk(mdl.bones))
+        header.bone_controller_count = len(mdl.bone_controllers)
+        header.bone_controller_offset = buffer.append(pack_chunk(mdl.bone_controllers))
+        header.attachment_count = len(mdl.attachments)
+        header.attachment_offset = buffer.append(pack_chunk(mdl.attachments))
+        header.hitbox_count = len(mdl.hitboxes)
+        header.hitbox_offset = buffer.append(pack_chunk(mdl.hitboxes))
+
+        # Sequences point forward at their events, pivots and animations, so they are filled in last.
+        sequences = [copy_chunk(sequence) for sequence in mdl.sequences]
+        header.sequence_count = len(sequences)
+        header.sequence_offset = buffer.reserve(sizeof(Sequence) * len(sequences))
+        for sequence, mdl_sequence in zip(sequences, mdl.sequences):
+            sequence.event_count = len(mdl_sequence.events)
+            sequence.event_offset = buffer.append(pack_chunk(mdl_sequence.events))
+            sequence.pivot_count = len(mdl_sequence.pivots)
+            sequence.pivot_offset = buffer.append(pack_chunk(mdl_sequence.pivots))
+
+        header.sequence_group_count = len(mdl.sequence_groups)
+        header.sequence_group_offset = buffer.append(pack_chunk(mdl.sequence_groups))
+        header.transition_count = int(round(len(mdl.transitions) ** 0.5))
+        header.transition_offset = buffer.append(mdl.transitions)
+
+        # Sequences in other sequence groups keep pointing into their own files.
+        for sequence, mdl_sequence in zip(sequences, mdl.sequences):
+            if hasattr(mdl_sequence, 'animations'):
+                sequence.anim_offset = buffer.append(pack_animations(mdl, mdl_sequence))
+        buffer.write_at(header.sequence_offset, pack_chunk(sequences))
+
+        body_parts = [copy_chunk(body_part) for body_part in mdl.body_parts]
+        header.body_part_count = len(body_parts)
+        header.body_part_offset = buffer.reserve(sizeof(BodyPart) * len(body_parts))
+        for body_part, mdl_body_part in zip(body_parts, mdl.body_parts):
+            models = [copy_chunk(model) for model in mdl_body_part.models]
+            body_part.model_count = len(models)
+            body_part.model_offset = buffer.reserve(sizeof(Model) * len(models))
+            for model, mdl_model in zip(models, mdl_body_part.models):
+                model.vertex_count = len(mdl_model.vertices)
+                model.vertex_bone_indices_offset = buffer.append(bytes(mdl_model.vertex_bone_indices))
+                model.normal_count = len(mdl_model.normals)
+                model.normal_bone_info_offset = buffer.append(bytes(mdl_model.normal_bone_indices))
+                model.vertex_offset = buffer.append(
+                    numpy.array(mdl_model.vertices, dtype=numpy.float32).reshape(-1, 3).tobytes())
+                model.normal_offset = buffer.append(
+                    numpy.array(mdl_model.normals, dtype=numpy.float32).reshape(-1, 3).tobytes())
+                model.group_count = 0
+                model.group_offset = 0
+                meshes = [copy_chunk(mesh) for mesh in mdl_model.meshes]
+                model.mesh_count = len(meshes)
+                model.mesh_offset = buffer.reserve(sizeof(Mesh) * len(meshes))
+                for mesh, mdl_mesh in zip(meshes, mdl_model.meshes):
+                    triangles = triangles_from_faces(mdl_mesh.faces)
+                    faces = build_faces(triangles) if optimize_faces else mdl_mesh.faces
+                    mesh.face_count = len(triangles)
+                    mesh.normal_offset = 0
+                    mesh.face_offset = buffer.append(pack_faces(faces))
+                buffer.write_at(model.mesh_offset, pack_chunk(meshes))
+            buffer.write_at(body_part.model_offset, pack_chunk(models))
+        buffer.write_at(header.body_part_offset, pack_chunk(body_parts))
+
+        textures = [copy_chunk(texture) for texture in mdl.textures]
+        header.texture_count = len(textures)
+        header.texture_offset = buffer.reserve(sizeof(Texture) * len(textures))
+        header.skin_family_count = len(mdl.skin_families)
+        header.skin_reference_count = len(mdl.skin_families[0]) if mdl.skin_families else 0
+        header.skin_offset = buffer.append(struct.pack(f'{header.skin_family_count * header.skin_reference_count}H',
+                                                       *[index for family in mdl.skin_families for index in family]))
+        header.texture_data_offset = buffer.reserve(0)
+        for texture, mdl_texture in zip(textures, mdl.textures):
+            texture.data_offset = buffer.append(mdl_texture.indices + mdl_texture.palette)
+        buffer.write_at(header.texture_offset, pack_chunk(textures))
+
+        buffer.align()
+        header.file_size = len(buffer.data)
+        buffer.write_at(header_offset, bytes(header))
+        return bytes(buffer.data)
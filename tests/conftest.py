@@ -0,0 +1,164 @@
+import math
+import random
+import sys
+import types
+import numpy
+import pytest
+
+# Outside of Blender, the standalone mathutils module may not be installed. The reader only needs Euler to matrix
+# conversion and 4x4 matrix products from it, so fall back to a minimal numpy-backed stand-in in that case.
+try:
+    import mathutils
+except ImportError:
+    class Matrix(numpy.ndarray):
+        def __new__(cls, rows):
+            return numpy.asarray(rows, dtype=numpy.float64).view(cls)
+
+        @staticmethod
+        def Identity(size):
+            return Matrix(numpy.identity(size))
+
+        @staticmethod
+        def Translation(location):
+            matrix = numpy.identity(4)
+            matrix[:3, 3] = location
+            return Matrix(matrix)
+
+        def to_4x4(self):
+            matrix = numpy.identity(4)
+            matrix[:3, :3] = self
+            return Matrix(matrix)
+
+    class Euler(object):
+        def __init__(self, angles, order='XYZ'):
+            self.angles = angles
+
+        def to_matrix(self):
+            x, y, z = self.angles
+            rx = numpy.array([[1, 0, 0], [0, math.cos(x), -math.sin(x)], [0, math.sin(x), math.cos(x)]])
+            ry = numpy.array([[math.cos(y), 0, math.sin(y)], [0, 1, 0], [-math.sin(y), 0, math.cos(y)]])
+            rz = numpy.array([[math.cos(z), -math.sin(z), 0], [math.sin(z), math.cos(z), 0], [0, 0, 1]])
+            return Matrix(rz @ ry @ rx)
+
+    mathutils = types.ModuleType('mathutils')
+    mathutils.Matrix = Matrix
+    mathutils.Euler = Euler
+    mathutils.Quaternion = object
+    mathutils.Vector = object
+    sys.modules['mathutils'] = mathutils
+
+# These must come after the mathutils fallback above, since the package imports it.
+from src.mdl import *
+from src.animation import encode_animation_channel
+
+GRID_SIZE = 6
+
+
+def create_face_vertex(vertex_index: int):
+    return FaceVertex(vertex_index, 0, vertex_index % GRID_SIZE, vertex_index // GRID_SIZE)
+
+
+def create_mdl():
+    """Builds a small model with a bone chain, two sequences (one of them blended) and a grid mesh stored as one
+    command per triangle."""
+    rng = random.Random(1)
+    mdl = Mdl()
+    mdl.header = Header()
+    mdl.header.name = b'test.mdl'
+    for bone_index in range(3):
+        bone = Bone()
+        bone.name = f'bone{bone_index}'.encode()
+        bone.parent_index = bone_index - 1
+        bone.location[:] = (bone_index, 0.0, 0.0)
+        bone.rotation[:] = (0.0, 0.0, 0.1 * bone_index)
+        bone.location_scale[:] = (0.01, 0.01, 0.01)
+        bone.rotation_scale[:] = (0.001, 0.001, 0.001)
+        bone.bone_controllers[:] = [-1] * 6
+        mdl.bones.append(bone)
+    bone_controller = BoneController()
+    bone_controller.bone_index = 2
+    bone_controller.type = BoneControllerType.ZR
+    bone_controller.start_angle = -30.0
+    bone_controller.end_angle = 30.0
+    mdl.bone_controllers = [bone_controller]
+    mdl.bones[2].bone_controllers[5] = 0
+    hitbox = Hitbox()
+    hitbox.bone_index = 1
+    hitbox.bounding_box.min[:] = (-1.0, -1.0, -1.0)
+    hitbox.bounding_box.max[:] = (1.0, 1.0, 1.0)
+    mdl.hitboxes = [hitbox]
+    attachment = Attachment()
+    attachment.name = b'muzzle'
+    attachment.bone_index = 2
+    attachment.location[:] = (1.0, 2.0, 3.0)
+    mdl.attachments = [attachment]
+    sequence_group = SequenceGroup()
+    sequence_group.label = b'default'
+    mdl.sequence_groups = [sequence_group]
+    mdl.transitions = bytes([0, 1, 1, 0])
+
+    # The first sequence is long enough to need runs capped at 255 frames.
+    for sequence_index, (frame_count, blend_count) in enumerate([(300, 1), (10, 2)]):
+        sequence = Sequence()
+        sequence.name = f'sequence{sequence_index}'.encode()
+        sequence.fps = 30.0
+        sequence.frame_count = frame_count
+        sequence.blend_count = blend_count
+        event = SequenceEvent()
+        event.frame_index = 3
+        event.event_index = 5001
+        event.options = b'11'
+        sequence.events = [event]
+        sequence.pivots = []
+        sequence.animations = []
+        for _ in range(blend_count * len(mdl.bones)):
+            animation = Animation()
+            animation.values = [[] for _ in range(6)]
+            for channel_index in (0, 4, 5):
+                raw_values = []
+                value = 0
+                for _ in range(frame_count):
+                    if rng.random() < 0.4:
+                        value = rng.randint(-500, 500)
+                    raw_values.append(value)
+                animation.value_offsets[channel_index] = 1
+                animation.values[channel_index] = encode_animation_channel(raw_values)
+            sequence.animations.append(animation)
+        mdl.sequences.append(sequence)
+
+    mesh = Mesh()
+    mesh.normal_count = 1
+    mesh.faces = []
+    for y in range(GRID_SIZE - 1):
+        for x in range(GRID_SIZE - 1):
+            i = y * GRID_SIZE + x
+            for triangle in ((i, i + 1, i + GRID_SIZE), (i + 1, i + GRID_SIZE + 1, i + GRID_SIZE)):
+                face = Face()
+                face.vertices = [create_face_vertex(vertex_index) for vertex_index in triangle]
+                mesh.faces.append(face)
+    model = Model()
+    model.name = b'grid'
+    model.meshes = [mesh]
+    model.vertices = [(float(x), float(y), 0.0) for y in range(GRID_SIZE) for x in range(GRID_SIZE)]
+    model.vertex_bone_indices = [1] * len(model.vertices)
+    model.normals = [(0.0, 0.0, 1.0)]
+    model.normal_bone_indices = [1]
+    body_part = BodyPart()
+    body_part.name = b'body'
+    body_part.models = [model]
+    mdl.body_parts = [body_part]
+
+    texture = Texture()
+    texture.filename = b'texture.bmp'
+    texture.width = 4
+    texture.height = 2
+    texture.indices = bytes(range(8))
+    texture.palette = bytes(range(256)) * 3
+    mdl.textures = [texture]
+    mdl.skin_families = [(0,)]
+    return mdl
+
+
+@pytest.fixture
+def mdl():
+    return create_mdl()
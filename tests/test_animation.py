@@ -0,0 +1,179 @@
+import numpy
+import pytest
+from src.mdl import *
+from src.animation import *
+
+
+def create_animation_values(runs):
+    """Builds animation values from (explicit values, total frames) runs."""
+    values = []
+    for run, total in runs:
+        header = AnimationValue()
+        header.header.valid = len(run)
+        header.header.total = total
+        values.append(header)
+        for value in run:
+            data = AnimationValue()
+            data.data.value = value
+            values.append(data)
+    return values
+
+
+def test_decode_animation_channel():
+    values = create_animation_values([([1, 2, 3], 5), ([7], 4)])
+    raw_values, key_mask = decode_animation_channel(9, values)
+    assert list(raw_values) == [1, 2, 3, 3, 3, 7, 7, 7, 7]
+    # Every explicit value is keyed, as is the last frame of each held run.
+    assert list(numpy.flatnonzero(key_mask)) == [0, 1, 2, 4, 5, 8]
+
+
+def test_decode_animation_channel_held_to_end():
+    # The last run claims more frames than the sequence has left, so its hold is cut off at the last frame.
+    values = create_animation_values([([4], 2), ([5, 6], 10)])
+    raw_values, key_mask = decode_animation_channel(6, values)
+    assert list(raw_values) == [4, 4, 5, 6, 6, 6]
+    assert list(numpy.flatnonzero(key_mask)) == [0, 1, 2, 3, 5]
+
+
+def test_decode_animation_channel_capped_runs():
+    # Runs span at most 255 frames, so a 300 frame hold takes two runs.
+    values = create_animation_values([([9], 255), ([9], 45)])
+    raw_values, key_mask = decode_animation_channel(300, values)
+    assert numpy.all(raw_values == 9)
+    assert list(numpy.flatnonzero(key_mask)) == [0, 254, 255, 299]
+
+
+def test_decode_animation_channel_truncated():
+    values = create_animation_values([([1, 2], 3)])
+    with pytest.raises(RuntimeError):
+        decode_animation_channel(5, values)
+
+
+def test_encode_animation_channel_caps_runs():
+    raw_values = [3] * 300 + list(range(260))
+    values = encode_animation_channel(raw_values)
+    headers = []
+    value_index = 0
+    while value_index < len(values):
+        headers.append((values[value_index].header.valid, values[value_index].header.total))
+        value_index += values[value_index].header.valid + 1
+    assert all(valid <= total <= 255 for valid, total in headers)
+    assert list(decode_animation_channel(len(raw_values), values)[0]) == raw_values
+
+
+def test_decode_animation_holds_between_keys(mdl):
+    locations, quaternions, key_mask, animated = decode_animation(mdl, mdl.sequences[0], 0)
+    assert numpy.all(animated)
+    # Across a gap between two keys of a bone, every one of its channels is held, so linear interpolation is exact.
+    held_count = 0
+    for bone_index in range(len(mdl.bones)):
+        frames = numpy.flatnonzero(key_mask[:, bone_index])
+        assert frames[0] == 0 and frames[-1] == mdl.sequences[0].frame_count - 1
+        for start, end in zip(frames, frames[1:]):
+            if end - start == 1:
+                continue
+            held_count += 1
+            assert numpy.all(locations[start:end + 1, bone_index] == locations[start, bone_index])
+            assert numpy.all(quaternions[start:end + 1, bone_index] == quaternions[start, bone_index])
+    assert held_count > 0
+
+
+def test_reduce_keyframes_drops_collinear_keys():
+    frames = [0, 1, 2, 3, 4, 8]
+    assert list(reduce_keyframes(frames, [0, 1, 2, 3, 3, 3])) == [0, 3, 5]
+    assert list(reduce_keyframes(frames, [5, 5, 5, 5, 5, 5])) == [0, 5]
+    assert list(reduce_keyframes([0, 1], [0, 1])) == [0, 1]
+    assert list(reduce_keyframes([0], [1])) == [0]
+
+
+def test_reduce_keyframes_tolerance():
+    frames = [0, 1, 2, 3, 4]
+    values = [0.0, 0.05, 0.0, 1.0, 0.0]
+    assert list(reduce_keyframes(frames, values)) == [0, 1, 2, 3, 4]
+    # The small bump is within tolerance and dropped, the large one is kept.
+    assert list(reduce_keyframes(frames, values, 0.1)) == [0, 2, 3, 4]
+    assert list(reduce_keyframes(frames, values, 2.0)) == [0, 4]
+
+
+def create_blended_sequence(mdl, angles, blend_type=BoneControllerType.XR):
+    """Builds a single-frame sequence whose blends each turn the root bone by one of `angles` (radians) about z."""
+    sequence = Sequence()
+    sequence.name = b'blended'
+    sequence.frame_count = 1
+    sequence.blend_count = len(angles)
+    sequence.blend_type[:] = (blend_type, blend_type)
+    sequence.blend_start[:] = (-45.0, -90.0)
+    sequence.blend_end[:] = (45.0, 90.0)
+    sequence.animations = []
+    for angle in angles:
+        for bone_index in range(len(mdl.bones)):
+            animation = Animation()
+            animation.values = [[] for _ in range(6)]
+            if bone_index == 0:
+                animation.value_offsets[5] = 1
+                animation.values[5] = encode_animation_channel([round(angle / mdl.bones[0].rotation_scale[2])])
+            sequence.animations.append(animation)
+    return sequence
+
+
+def test_calc_blend_weight():
+    sequence = Sequence()
+    sequence.blend_start[:] = (-45.0, 10.0)
+    sequence.blend_end[:] = (45.0, 10.0)
+    assert calc_blend_weight(sequence, 0, -45.0) == 0.0
+    assert calc_blend_weight(sequence, 0, 0.0) == 0.5
+    assert calc_blend_weight(sequence, 0, 90.0) == 1.0
+    # A blend with an empty range always uses its first blend.
+    assert calc_blend_weight(sequence, 1, 50.0) == 0.0
+
+
+def test_calc_blend_weight_negates_reversed_rotations():
+    sequence = Sequence()
+    sequence.blend_type[0] = BoneControllerType.YR
+    sequence.blend_start[0] = 45.0
+    sequence.blend_end[0] = -45.0
+    assert calc_blend_weight(sequence, 0, 45.0) == 1.0
+    assert calc_blend_weight(sequence, 0, -45.0) == 0.0
+    assert calc_blend_weight(sequence, 0, 22.5) == 0.75
+    # Non-rotation blends are mapped as they are.
+    sequence.blend_type[0] = BoneControllerType.X
+    assert calc_blend_weight(sequence, 0, 45.0) == 0.0
+
+
+def test_calc_blend_weight_wraps_rotations():
+    sequence = Sequence()
+    sequence.blend_type[0] = BoneControllerType.ZR
+    sequence.blend_start[0] = 170.0
+    sequence.blend_end[0] = 190.0
+    assert calc_blend_weight(sequence, 0, -180.0) == 0.5
+    assert calc_blend_weight(sequence, 0, -175.0) == 0.75
+    # Ranges that already cover a full turn are not wrapped.
+    sequence.blend_start[0] = 0.0
+    sequence.blend_end[0] = 360.0
+    assert calc_blend_weight(sequence, 0, -10.0) == 0.0
+
+
+def test_blend_animation_two_blends(mdl):
+    sequence = create_blended_sequence(mdl, (0.0, 0.8))
+    _, quaternions, _, animated = blend_animation(mdl, sequence, (-45.0, 0.0))
+    assert numpy.allclose(quaternions[0, 0], euler_to_quaternion((0.0, 0.0, 0.0)))
+    _, quaternions, _, _ = blend_animation(mdl, sequence, (0.0, 0.0))
+    assert numpy.allclose(quaternions[0, 0], euler_to_quaternion((0.0, 0.0, 0.4)))
+    assert list(animated) == [True, False, False]
+
+
+def test_blend_animation_four_blend_grid(mdl):
+    sequence = create_blended_sequence(mdl, (0.0, 0.4, 0.8, 1.2))
+    # The first value mixes blends 0 and 1 (and 2 and 3); the second mixes the two results.
+    expected_angles = {
+        (-45.0, -90.0): 0.0,
+        (45.0, -90.0): 0.4,
+        (-45.0, 90.0): 0.8,
+        (45.0, 90.0): 1.2,
+        (0.0, -90.0): 0.2,
+        (0.0, 0.0): 0.6,
+        (45.0, 0.0): 0.8,
+    }
+    for blend_values, angle in expected_angles.items():
+        _, quaternions, _, _ = blend_animation(mdl, sequence, blend_values)
+        assert numpy.allclose(quaternions[0, 0], euler_to_quaternion((0.0, 0.0, angle))), blend_values
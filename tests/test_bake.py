@@ -0,0 +1,59 @@
+import numpy
+from src.bake import bake_hitboxes_and_attachments, bake_to_file
+from src.sampler import PoseSampler
+
+
+def test_bake_layout(mdl):
+    baked = bake_hitboxes_and_attachments(mdl)
+    frame_counts = [sequence.frame_count for sequence in mdl.sequences]
+    frame_count = sum(frame_counts)
+    assert list(baked['sequence_names']) == [sequence.name.decode() for sequence in mdl.sequences]
+    assert list(baked['sequence_frame_offsets']) == [0, frame_counts[0], frame_count]
+    assert list(baked['sequence_blend_indices']) == [0, 0]
+    assert baked['hitbox_bone_indices'].shape == (1,)
+    assert baked['hitbox_extents'].shape == (1, 3)
+    for name in ('hitbox_centers', 'hitbox_mins', 'hitbox_maxs'):
+        assert baked[name].shape == (frame_count, 1, 3)
+    assert baked['hitbox_rotations'].shape == (frame_count, 1, 3, 3)
+    assert baked['attachment_positions'].shape == (frame_count, 1, 3)
+    assert numpy.all(baked['hitbox_mins'] <= baked['hitbox_centers'])
+    assert numpy.all(baked['hitbox_centers'] <= baked['hitbox_maxs'])
+
+
+def test_bake_matches_sampler(mdl):
+    baked = bake_hitboxes_and_attachments(mdl)
+    sampler = PoseSampler(mdl)
+    frame_offset = baked['sequence_frame_offsets'][1]
+    for frame in (0, 5, 9):
+        attachment_matrices = sampler.attachment_matrices(1, 0, frame)
+        hitbox_matrices = sampler.hitbox_matrices(1, 0, frame)
+        assert numpy.allclose(baked['attachment_positions'][frame_offset + frame], attachment_matrices[:, :3, 3],
+                              atol=1e-4)
+        assert numpy.allclose(baked['hitbox_centers'][frame_offset + frame], hitbox_matrices[:, :3, 3], atol=1e-4)
+        # The rotations are orthonormal once the extents are divided back out.
+        rotation = baked['hitbox_rotations'][frame_offset + frame, 0]
+        assert numpy.allclose(rotation @ rotation.T, numpy.identity(3), atol=1e-5)
+
+
+def test_bake_clamps_blend_index(mdl):
+    baked = bake_hitboxes_and_attachments(mdl, blend_index=1)
+    assert list(baked['sequence_blend_indices']) == [0, 1]
+    assert baked['attachment_positions'].shape[0] == sum(sequence.frame_count for sequence in mdl.sequences)
+
+
+def test_bake_skips_sequences_without_animations(mdl):
+    del mdl.sequences[0].animations
+    baked = bake_hitboxes_and_attachments(mdl)
+    assert list(baked['sequence_frame_offsets']) == [0, 0, mdl.sequences[1].frame_count]
+    assert baked['hitbox_centers'].shape[0] == mdl.sequences[1].frame_count
+
+
+def test_bake_to_file(mdl, tmp_path):
+    path = tmp_path / 'test.npz'
+    bake_to_file(mdl, str(path))
+    baked = bake_hitboxes_and_attachments(mdl)
+    with numpy.load(path) as loaded:
+        assert set(loaded.files) == set(baked)
+        for name, array in baked.items():
+            assert loaded[name].dtype == array.dtype
+            assert numpy.array_equal(loaded[name], array)
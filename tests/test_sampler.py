@@ -0,0 +1,131 @@
+import math
+import numpy
+import pytest
+from src.mdl import *
+from src.sampler import PoseSampler
+
+
+def rotation_angle(rotation):
+    return math.acos(min(max((numpy.trace(rotation) - 1.0) / 2.0, -1.0), 1.0))
+
+
+def rotation_z(angle: float):
+    return numpy.array([[math.cos(angle), -math.sin(angle), 0.0],
+                        [math.sin(angle), math.cos(angle), 0.0],
+                        [0.0, 0.0, 1.0]])
+
+
+def local_rotation(bone_matrices, bone_index: int, parent_index: int):
+    return bone_matrices[parent_index, :3, :3].T @ bone_matrices[bone_index, :3, :3]
+
+
+def test_fractional_frame_interpolates(mdl):
+    sampler = PoseSampler(mdl)
+    before = sampler.bone_matrices(0, 0, 10)
+    after = sampler.bone_matrices(0, 0, 11)
+    between = sampler.bone_matrices(0, 0, 10.25)
+    # The root bone has no parent, so its location is lerped and its rotation slerped directly.
+    assert numpy.allclose(between[0, :3, 3], before[0, :3, 3] + (after[0, :3, 3] - before[0, :3, 3]) * 0.25)
+    full_angle = rotation_angle(before[0, :3, :3].T @ after[0, :3, :3])
+    assert full_angle > 0.0
+    assert math.isclose(rotation_angle(before[0, :3, :3].T @ between[0, :3, :3]), full_angle * 0.25, rel_tol=1e-6)
+
+
+def test_integer_frame_matches_sequence(mdl):
+    sampler = PoseSampler(mdl)
+    sequence_bone_matrices = sampler.calc_sequence_bone_matrices(0, 0)
+    assert sequence_bone_matrices.shape == (mdl.sequences[0].frame_count, len(mdl.bones), 4, 4)
+    for frame in (0, 7, mdl.sequences[0].frame_count - 1):
+        assert numpy.allclose(sampler.bone_matrices(0, 0, frame), sequence_bone_matrices[frame])
+
+
+def test_frame_is_clamped(mdl):
+    sampler = PoseSampler(mdl)
+    last_frame = mdl.sequences[0].frame_count - 1
+    assert numpy.allclose(sampler.bone_matrices(0, 0, -5), sampler.bone_matrices(0, 0, 0))
+    assert numpy.allclose(sampler.bone_matrices(0, 0, last_frame + 5), sampler.bone_matrices(0, 0, last_frame))
+
+
+def test_frame_at_time(mdl):
+    assert PoseSampler(mdl).frame_at_time(0, 0.5) == mdl.sequences[0].fps * 0.5
+
+
+def test_controller_rotates_bone(mdl):
+    sampler = PoseSampler(mdl)
+    rest = local_rotation(sampler.bone_matrices(0, 0, 3), 2, 1)
+    rotated = local_rotation(sampler.bone_matrices(0, 0, 3, controllers=(20.0,)), 2, 1)
+    # Controllers add to the euler z angle, which applies outermost.
+    assert numpy.allclose(rotated, rotation_z(math.radians(20.0)) @ rest)
+
+
+def test_controller_is_clamped(mdl):
+    sampler = PoseSampler(mdl)
+    assert numpy.allclose(sampler.bone_matrices(0, 0, 3, controllers=(90.0,)),
+                          sampler.bone_matrices(0, 0, 3, controllers=(30.0,)))
+    assert numpy.allclose(sampler.bone_matrices(0, 0, 3, controllers=(-90.0,)),
+                          sampler.bone_matrices(0, 0, 3, controllers=(-30.0,)))
+
+
+def test_looping_controller_wraps(mdl):
+    mdl.bone_controllers[0].type = BoneControllerType.ZR | BoneControllerType.RLOOP
+    sampler = PoseSampler(mdl)
+    expected = sampler.bone_matrices(0, 0, 3, controllers=(10.0,))
+    assert numpy.allclose(sampler.bone_matrices(0, 0, 3, controllers=(370.0,)), expected)
+    assert numpy.allclose(sampler.bone_matrices(0, 0, 3, controllers=(-350.0,)), expected)
+    # Looping controllers are not clamped to their range.
+    assert not numpy.allclose(sampler.bone_matrices(0, 0, 3, controllers=(90.0,)),
+                              sampler.bone_matrices(0, 0, 3, controllers=(30.0,)))
+
+
+def test_attachment_and_hitbox_matrices(mdl):
+    sampler = PoseSampler(mdl)
+    bone_matrices = sampler.bone_matrices(0, 0, 4)
+    attachment = mdl.attachments[0]
+    attachment_matrices = sampler.attachment_matrices(0, 0, 4)
+    assert attachment_matrices.shape == (1, 4, 4)
+    assert numpy.allclose(attachment_matrices[0, :3, 3],
+                          (bone_matrices[attachment.bone_index] @ numpy.append(attachment.location, 1.0))[:3])
+    # Hitbox matrices map the unit cube onto the box in bone space.
+    hitbox = mdl.hitboxes[0]
+    hitbox_matrix = numpy.identity(4)
+    hitbox_matrix[:3, :3] = numpy.diag(bounding_box_extents(hitbox.bounding_box))
+    hitbox_matrix[:3, 3] = bounding_box_center(hitbox.bounding_box)
+    hitbox_matrices = sampler.hitbox_matrices(0, 0, 4)
+    assert hitbox_matrices.shape == (1, 4, 4)
+    assert numpy.allclose(hitbox_matrices[0], bone_matrices[hitbox.bone_index] @ hitbox_matrix)
+
+
+def test_repeated_queries_are_cached(mdl):
+    sampler = PoseSampler(mdl)
+    matrices = sampler.bone_matrices(0, 0, 5.5)
+    assert sampler.bone_matrices(0, 0, 5.5) is matrices
+    assert not matrices.flags.writeable
+    with pytest.raises(ValueError):
+        matrices[0, 0, 0] = 0.0
+    assert sampler.bone_matrices(0, 0, 5.5, controllers=(10.0,)) is not matrices
+
+
+def test_cache_evicts_least_recently_used(mdl):
+    sampler = PoseSampler(mdl, cache_size=2)
+    first = sampler.bone_matrices(0, 0, 0)
+    second = sampler.bone_matrices(0, 0, 1)
+    assert sampler.bone_matrices(0, 0, 0) is first
+    sampler.bone_matrices(0, 0, 2)
+    # Frame 1 was used least recently, so it is the one evicted.
+    assert sampler.bone_matrices(0, 0, 0) is first
+    assert sampler.bone_matrices(0, 0, 1) is not second
+
+
+def test_out_of_range_blend_raises(mdl):
+    sampler = PoseSampler(mdl)
+    with pytest.raises(RuntimeError):
+        sampler.bone_matrices(0, 1, 0)
+    with pytest.raises(RuntimeError):
+        sampler.bone_matrices(0, -1, 0)
+    assert numpy.allclose(sampler.calc_sequence_bone_matrices(1, 1)[0], sampler.bone_matrices(1, 1, 0))
+
+
+def test_empty_sequence_raises(mdl):
+    mdl.sequences[1].frame_count = 0
+    with pytest.raises(RuntimeError):
+        PoseSampler(mdl).bone_matrices(1, 0, 0)
@@ -0,0 +1,42 @@
+import numpy
+from src.animation import decode_animation
+from src.reader import MdlReader
+from src.writer import MdlWriter, triangles_from_faces
+
+
+def write_and_read(mdl, path, optimize_faces: bool = False):
+    data = MdlWriter.to_bytes(mdl, optimize_faces)
+    path.write_bytes(data)
+    return data, MdlReader.from_file(str(path))
+
+
+def normalize_triangle(triangle):
+    """Rotates a triangle to start at its smallest vertex, so triangles compare equal regardless of their first
+    vertex but not regardless of their winding."""
+    return min(triangle[i:] + triangle[:i] for i in range(3))
+
+
+def test_round_trip(mdl, tmp_path):
+    data, read_mdl = write_and_read(mdl, tmp_path / 'test.mdl')
+    assert MdlWriter.to_bytes(read_mdl) == data
+    for sequence, read_sequence in zip(mdl.sequences, read_mdl.sequences):
+        for blend_index in range(sequence.blend_count):
+            locations, quaternions, key_mask, animated = decode_animation(mdl, sequence, blend_index)
+            read_locations, read_quaternions, read_key_mask, read_animated = \
+                decode_animation(read_mdl, read_sequence, blend_index)
+            assert numpy.array_equal(locations, read_locations)
+            assert numpy.array_equal(quaternions, read_quaternions)
+            assert numpy.array_equal(key_mask, read_key_mask)
+            assert numpy.array_equal(animated, read_animated)
+    assert read_mdl.sequences[0].events[0].event_index == 5001
+    assert read_mdl.transitions == mdl.transitions
+    assert read_mdl.textures[0].indices == mdl.textures[0].indices
+
+
+def test_optimize_faces(mdl, tmp_path):
+    _, read_mdl = write_and_read(mdl, tmp_path / 'test.mdl', optimize_faces=True)
+    faces = mdl.body_parts[0].models[0].meshes[0].faces
+    read_faces = read_mdl.body_parts[0].models[0].meshes[0].faces
+    assert len(read_faces) < len(faces)
+    assert sorted(map(normalize_triangle, triangles_from_faces(read_faces))) == \
+        sorted(map(normalize_triangle, triangles_from_faces(faces)))